@@ -1,9 +1,252 @@
+import io
 import os
+import csv
 import time
+import random
+import concurrent.futures
 import joblib
 import pandas as pd
 import subprocess
 import json
+import threading
+import functools
+import shutil
+import tempfile
+import hashlib
+import urllib.request
+import soundfile as sf
+import yt_dlp
+import yt_dlp.cookies
+
+if os.name == 'nt':
+    import ctypes
+    import msvcrt
+else:
+    import fcntl
+
+try:
+    import mutagen
+except ImportError:  # optional, only needed for containers libsndfile can't open
+    mutagen = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional, pandas' C parser is used instead
+    pa = pacsv = None
+
+# One YoutubeDL per worker, reused across segments so its connection pool survives
+_worker = threading.local()
+
+_PERMANENT_ERRORS = ("this video is unavailable", "video unavailable", "private", "video has been removed")
+_RATE_LIMIT_ERRORS = ("http error 429", "too many requests")
+
+# Upper bound for use_async, every thread holds its own YoutubeDL and ffmpeg process
+_MAX_CONCURRENT_DOWNLOADS = 64
+
+
+class _CircuitBreaker:
+    """
+    Pauses every worker in the process once too many downloads fail back to back,
+    so a rate-limited run stops hammering YouTube instead of burning its retries.
+    """
+
+    def __init__(self, threshold: int = 10, window: float = 60, cooldown: float = 300):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures = []
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def record_success(self):
+        with self._lock:
+            self._failures.clear()
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self._failures = [t for t in self._failures if now - t < self.window] + [now]
+            if len(self._failures) >= self.threshold:
+                print(f"[WARNING] {len(self._failures)} consecutive failures, pausing all downloads for {self.cooldown}s...")
+                self._open_until = now + self.cooldown
+                self._failures.clear()
+
+
+_breaker = _CircuitBreaker()
+
+_manifest_lock = threading.Lock()
+
+_EXTENSIONS = {'vorbis': 'ogg', 'wav': 'wav', 'mp3': 'mp3', 'flac': 'flac', 'opus': 'opus', 'm4a': 'm4a'}
+
+
+def _fastcopy(src, dst):
+    """
+    Replicates src at dst without going through a shell: a hard link when possible,
+    otherwise a kernel-side copy (CopyFileW on Windows, sendfile via shutil elsewhere).
+    """
+    try:
+        os.link(src, dst)
+        return
+    except (OSError, NotImplementedError):
+        pass
+
+    if os.name == 'nt' and ctypes.windll.kernel32.CopyFileW(src, dst, False):
+        return
+    shutil.copyfile(src, dst)
+
+
+def _load_manifest(manifest_path):
+    completed = set()
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                completed.add(json.loads(line)['key'])
+            except (ValueError, KeyError):
+                continue  # partially written line from an interrupted run
+    return completed
+
+
+def _append_manifest(manifest_path, entry):
+    line = json.dumps(entry) + '\n'
+    # the thread lock covers workers in this process, the file lock other processes sharing root_path
+    with _manifest_lock, open(manifest_path, 'a') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(line)
+            f.flush()
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _cached_fetch(url, cache_dir):
+    """
+    Returns the path of a local copy of url, kept under cache_dir.
+    The copy is only re-downloaded when the remote ETag/Last-Modified changes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    name = hashlib.sha1(url.encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{name}.csv")
+    meta_path = os.path.join(cache_dir, f"{name}.json")
+
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method='HEAD'), timeout=30) as response:
+            version = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    except OSError:
+        version = None  # offline, fall back to whatever is cached
+
+    cached_version = None
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            cached_version = json.load(f).get('version')
+
+    if not os.path.exists(cache_path) or (version is not None and version != cached_version):
+        print(f"[INFO] Fetching {url}...")
+        # unique temp names, chunked runs may fill a cold cache from several processes at once
+        _atomic_write(cache_dir, cache_path, lambda tmp_path: urllib.request.urlretrieve(url, tmp_path))
+        _atomic_write(cache_dir, meta_path, lambda tmp_path: _write_json(tmp_path, {'url': url, 'version': version}))
+
+    return cache_path
+
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def _atomic_write(directory, path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_segments(csv_path):
+    """
+    Parses an AudioSet segments CSV into a DataFrame with the columns
+    YTID, start_seconds, end_seconds and positive_labels.
+    """
+    names = ['YTID', 'start_seconds', 'end_seconds', 'positive_labels']
+    if pacsv is not None:
+        # Arrow has no skipinitialspace, so drop the space after each ", " separator first
+        with open(csv_path, 'rb') as f:
+            data = f.read().replace(b', ', b',')
+        table = pacsv.read_csv(
+            io.BytesIO(data),
+            read_options=pacsv.ReadOptions(skip_rows=3, column_names=names),
+            convert_options=pacsv.ConvertOptions(column_types={
+                'YTID': pa.string(),
+                'start_seconds': pa.float64(),
+                'end_seconds': pa.float64(),
+                'positive_labels': pa.string(),
+            }),
+        )
+        return table.to_pandas()
+
+    # skipinitialspace handles the ", " separators so the C engine can be used,
+    # and lets the tokenizer strip the quotes around the label lists
+    return pd.read_csv(
+        csv_path,
+        sep=',',
+        skipinitialspace=True,
+        quotechar='"',
+        quoting=csv.QUOTE_MINIMAL,
+        skiprows=3,
+        header=None,
+        names=names,
+        engine='c'
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _probe_duration(file_path, mtime, size):
+    # mtime and size are only part of the cache key, so a rewritten file is probed again
+    try:
+        return sf.info(file_path).duration
+    except Exception:
+        pass
+
+    if mutagen is not None:
+        try:
+            audio = mutagen.File(file_path)
+            if audio is not None:
+                return audio.info.length
+        except Exception:
+            pass
+
+    try:
+        ffprobe_path = os.path.join("bin", "ffprobe.exe")
+
+        result = subprocess.run([
+            ffprobe_path, "-v", "quiet", "-show_entries", "format=duration",
+            "-of", "json", file_path
+        ], capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+        duration = float(data['format']['duration'])
+        return duration
+    except (OSError, subprocess.CalledProcessError, KeyError, ValueError, json.JSONDecodeError):
+        return None
 
 
 class Downloader:
@@ -21,9 +264,15 @@ class Downloader:
                  cookie_file: str = None,  # Path to a cookie file for yt-dlp, if needed
                  cookies_from_browser: bool = False,  # If True, cookies will be extracted from the browser
                  max_retries: int = 3,  # Number of retries for failed downloads
-                 retry_delay: int = 5,  # Seconds to wait between retries
+                 retry_delay: int = 5,  # Base seconds to wait between retries, doubled on every attempt
+                 max_delay: int = 300,  # Upper bound for the retry delay
                  start_idx: int = None,  # Optional start index for chunked download
-                 end_idx: int = None     # Optional end index for chunked download
+                 end_idx: int = None,    # Optional end index for chunked download
+                 cache_dir: str = None,  # Where the AudioSet CSVs are cached, defaults to ~/.cache/audioset_downloader
+                 use_async: bool = False,  # If True, keep n_jobs * 16 downloads (at most 64) in flight on a thread pool instead of joblib
+                 format: str = 'vorbis',  # Audio format passed to yt-dlp, can be overridden in download()
+                 quality: int = 5,
+                 duration_tolerance: float = 1.0  # Seconds a downloaded segment may run past end - start
                  ):
         self.root_path = root_path
         self.labels = labels
@@ -34,15 +283,28 @@ class Downloader:
         self.cookies_from_browser = cookies_from_browser
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.max_delay = max_delay
         self.start_idx = start_idx
         self.end_idx = end_idx
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "audioset_downloader")
+        self.use_async = use_async
+        self.duration_tolerance = duration_tolerance
+        self.manifest_path = os.path.join(self.root_path, 'manifest.jsonl')
+        self.completed = set()
+        self._set_format(format, quality)
+        self._cookie_timer = None
+        self._cookie_lock = threading.Lock()
+        self._base_params = None
 
         os.makedirs(self.root_path, exist_ok=True)
         self.read_class_mapping()
 
     def read_class_mapping(self):
         class_df = pd.read_csv(
-            f"http://storage.googleapis.com/us_audioset/youtube_corpus/v1/csv/class_labels_indices.csv", 
+            _cached_fetch(
+                f"http://storage.googleapis.com/us_audioset/youtube_corpus/v1/csv/class_labels_indices.csv",
+                self.cache_dir
+            ),
             sep=',',
         )
         self.display_to_machine_mapping = dict(zip(class_df['display_name'], class_df['mid']))
@@ -51,54 +313,91 @@ class Downloader:
 
     def get_audio_duration(self, file_path):
         try:
-            ffprobe_path = os.path.join("bin", "ffprobe.exe")
-
-            result = subprocess.run([
-                ffprobe_path, "-v", "quiet", "-show_entries", "format=duration",
-                "-of", "json", file_path
-            ], capture_output=True, text=True, check=True)
-            data = json.loads(result.stdout)
-            duration = float(data['format']['duration'])
-            return duration
-        except (subprocess.CalledProcessError, KeyError, ValueError, json.JSONDecodeError):
+            stat = os.stat(file_path)
+        except OSError:
             return None
+        return _probe_duration(file_path, stat.st_mtime_ns, stat.st_size)
 
-    def _build_ytdlp_command(self, ytid: str, file_path: str, start_seconds: float, end_seconds: float):
-        base_command = (f'yt-dlp -x --audio-format {self.format} --audio-quality {self.quality} '
-                        f'--ffmpeg-location "./bin" '
-                        f'--output "{file_path}" --postprocessor-args "-ss {start_seconds} -to {end_seconds}" '
-                        f'https://www.youtube.com/watch?v={ytid}')
+    def _ydl_params(self):
+        params = {
+            'format': 'bestaudio/best',  # same default as yt-dlp -x
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': self.format,
+                'preferredquality': str(self.quality),
+            }],
+            'ffmpeg_location': './bin',
+            'force_keyframes_at_cuts': True,
+            'quiet': True,
+            'noprogress': True,
+        }
 
         if self.cookie_file and self.cookies_from_browser:
             print(f"[WARNING] Both cookie_file and cookies_from_browser are set. Using cookie_file: {self.cookie_file}")
-            base_command += f' --cookies "{self.cookie_file}"'
+            params['cookiefile'] = self.cookie_file
         elif self.cookies_from_browser:
             print("[INFO] Extracting cookies from browser...")
-            base_command += ' --cookies-from-browser firefox'
+            params['cookiesfrombrowser'] = ('firefox',)
         elif self.cookie_file:
             print(f"[INFO] Using cookie file: {self.cookie_file}")
-            base_command += f' --cookies "{self.cookie_file}"'
+            params['cookiefile'] = self.cookie_file
+
+        return params
+
+    def _get_ydl(self):
+        if self._base_params is None:  # download_file called outside download()
+            self._base_params = self._ydl_params()
+        # _base_params is rebuilt on every download() run, so identity tells if this worker's instance is current
+        if getattr(_worker, 'params', None) is not self._base_params:
+            self._reset_ydl()
+            _worker.ydl = yt_dlp.YoutubeDL(dict(self._base_params))
+            # Load the jar now, then drop the save path: close() would otherwise write this worker's
+            # copy back over the shared cookie file, undoing background refreshes
+            _worker.ydl.cookiejar
+            _worker.ydl.params['cookiefile'] = None
+            _worker.params = self._base_params
+        return _worker.ydl
 
-        return base_command
+    def _reset_ydl(self):
+        ydl = getattr(_worker, 'ydl', None)
+        if ydl is not None:
+            ydl.close()
+        _worker.ydl = None
+        _worker.params = None
 
-    def download(self, format: str = 'vorbis', quality: int = 5):
+    def _run_ytdlp(self, ytid: str, file_path: str, start_seconds: float, end_seconds: float):
+        ydl = self._get_ydl()
+        ydl.params['outtmpl'] = {'default': file_path.replace('%', '%%')}
+        # Only fetch the requested section instead of trimming the full stream afterwards
+        ydl.params['download_ranges'] = yt_dlp.utils.download_range_func(None, [(start_seconds, end_seconds)])
+        try:
+            ydl.download([f'https://www.youtube.com/watch?v={ytid}'])
+        except (yt_dlp.utils.YoutubeDLError, OSError) as e:
+            # downloads run in-process now, so one bad video must not take down the whole run
+            return str(e)
+        return ''
+
+    def _set_format(self, format: str, quality: int):
         self.format = format
         self.quality = quality
+        self.ext = _EXTENSIONS.get(format, format)
+        self._file_name = '{}_{}-{}.' + self.ext
 
-        metadata = pd.read_csv(
-            f"http://storage.googleapis.com/us_audioset/youtube_corpus/v1/csv/{self.download_type}_segments.csv", 
-            sep=', ', 
-            skiprows=3,
-            header=None,
-            names=['YTID', 'start_seconds', 'end_seconds', 'positive_labels'],
-            engine='python'
-        )
+    def download(self, format: str = None, quality: int = None):
+        if format is not None or quality is not None:
+            self._set_format(format or self.format, self.quality if quality is None else quality)
+
+        metadata = read_segments(_cached_fetch(
+            f"http://storage.googleapis.com/us_audioset/youtube_corpus/v1/csv/{self.download_type}_segments.csv",
+            self.cache_dir
+        ))
 
         if self.labels is not None:
             self.real_labels = [self.display_to_machine_mapping[label] for label in self.labels]
-            metadata = metadata[metadata['positive_labels'].apply(lambda x: any([label in x for label in self.real_labels]))]
+            # exact id matching, a substring match would let /m/abc select rows labelled /m/abcd
+            target = set(self.real_labels)
+            metadata = metadata[metadata['positive_labels'].str.split(',').map(lambda ids: not target.isdisjoint(ids))]
 
-        metadata['positive_labels'] = metadata['positive_labels'].apply(lambda x: x.replace('"', ''))
         metadata = metadata.reset_index(drop=True)
 
         # Apply chunk indices
@@ -107,41 +406,130 @@ class Downloader:
         if self.end_idx is not None:
             metadata = metadata.iloc[:self.end_idx]
 
+        # Create every label directory up front rather than once per row
+        if self.copy_and_replicate:
+            needed = {self.machine_to_display_mapping[m] for row in metadata['positive_labels'] for m in row.split(',')}
+        else:
+            needed = {self.machine_to_display_mapping[row.split(',')[0]] for row in metadata['positive_labels']}
+        # a single listdir tells us which ones already exist from earlier runs
+        for display_label in needed - set(os.listdir(self.root_path)):
+            os.makedirs(os.path.join(self.root_path, display_label), exist_ok=True)
+
+        # Segments finished by earlier runs, so resuming doesn't touch the filesystem for them
+        self.completed = _load_manifest(self.manifest_path)
+
         print(f'Downloading {len(metadata)} files...')
 
-        joblib.Parallel(n_jobs=self.n_jobs, verbose=10)(
-            joblib.delayed(self.download_file)(
-                i,
-                metadata.loc[i, 'YTID'], 
-                metadata.loc[i, 'start_seconds'], 
-                metadata.loc[i, 'end_seconds'], 
-                metadata.loc[i, 'positive_labels'],
-                len(metadata)
-            ) for i in range(len(metadata))
-        )
+        columns = metadata[['YTID', 'start_seconds', 'end_seconds', 'positive_labels']]
+        total = len(columns)
+        rows = [
+            (i, ytid, start_seconds, end_seconds, positive_labels, total)
+            for i, (ytid, start_seconds, end_seconds, positive_labels) in enumerate(columns.itertuples(index=False, name=None))
+        ]
+        n_jobs = joblib.effective_n_jobs(self.n_jobs)
+
+        # Extract browser cookies once for the whole run instead of in every worker/retry
+        if self.cookies_from_browser and not self.cookie_file:
+            self._start_browser_cookies()
+        # Everything but the per-segment output path and range is fixed for the run
+        self._base_params = self._ydl_params()
+        try:
+            if self.use_async:
+                self._download_pool(rows, min(n_jobs * 16, _MAX_CONCURRENT_DOWNLOADS))
+            else:
+                # Work is network/ffmpeg bound, so threads avoid pickling self for every task
+                joblib.Parallel(
+                    n_jobs=n_jobs,
+                    backend='threading',
+                    batch_size=max(1, len(rows) // (n_jobs * 4)),
+                    pre_dispatch='2*n_jobs',
+                    verbose=10
+                )(joblib.delayed(self.download_file)(*row) for row in rows)
+        finally:
+            self._reset_ydl()  # with n_jobs=1 the calling thread's instance would outlive the run
+            if self._cookie_timer is not None:
+                self._stop_browser_cookies()
 
         print('Done.')
 
+    def _start_browser_cookies(self, refresh_interval: float = 30 * 60):
+        fd, cookie_path = tempfile.mkstemp(prefix='audioset_cookies_', suffix='.txt')
+        os.close(fd)
+        try:
+            self._save_browser_cookies(cookie_path)
+        except BaseException:
+            os.remove(cookie_path)
+            raise
+        self.cookie_file = cookie_path
+        self.cookies_from_browser = False
+
+        def refresh():
+            with self._cookie_lock:
+                if self._cookie_timer is None:
+                    return  # stopped, the cookie file is already gone
+                try:
+                    self._save_browser_cookies(cookie_path)
+                except Exception as e:
+                    print(f"[WARNING] Could not refresh browser cookies, keeping the previous ones: {e}")
+                self._cookie_timer = threading.Timer(refresh_interval, refresh)
+                self._cookie_timer.daemon = True
+                self._cookie_timer.start()
+
+        self._cookie_timer = threading.Timer(refresh_interval, refresh)
+        self._cookie_timer.daemon = True
+        self._cookie_timer.start()
+
+    def _save_browser_cookies(self, cookie_path):
+        print("[INFO] Extracting cookies from browser...")
+        jar = yt_dlp.cookies.extract_cookies_from_browser('firefox')
+        jar.save(f"{cookie_path}.tmp")
+        os.replace(f"{cookie_path}.tmp", cookie_path)
+
+    def _stop_browser_cookies(self):
+        # under the lock so a refresh in progress can't recreate the file after it is removed
+        with self._cookie_lock:
+            self._cookie_timer.cancel()
+            self._cookie_timer = None
+        os.remove(self.cookie_file)
+        self.cookie_file = None
+        self.cookies_from_browser = True
+
+    def _download_pool(self, rows, concurrency: int):
+        # a fixed set of threads pulling from one iterator, so pending rows don't each hold a future
+        pending = iter(rows)
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    row = next(pending, None)
+                if row is None:
+                    return
+                self.download_file(*row)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+
     def download_file(self, idx, ytid: str, start_seconds: float, end_seconds: float, positive_labels: str, total_rows: int):
         print("-"*160)
         print(f"[INFO] Downloading row {idx + 1} of {total_rows}...")  # show row and total
-        if self.copy_and_replicate:
-            for label in positive_labels.split(','):
-                display_label = self.machine_to_display_mapping[label]
-                os.makedirs(os.path.join(self.root_path, display_label), exist_ok=True)
-        else:
-            display_label = self.machine_to_display_mapping[positive_labels.split(',')[0]]
-            os.makedirs(os.path.join(self.root_path, display_label), exist_ok=True)
+        display_labels = [self.machine_to_display_mapping[label] for label in positive_labels.split(',')]
+        first_display_label = display_labels[0]
+        key = self._file_name.format(ytid, start_seconds, end_seconds)
+        file_path = os.path.join(self.root_path, first_display_label, key)
 
-        first_display_label = self.machine_to_display_mapping[positive_labels.split(',')[0]]
-        ext = {'vorbis':'ogg','wav':'wav','mp3':'mp3','flac':'flac','opus':'opus','m4a':'m4a'}.get(self.format, self.format)
-        file_path = os.path.join(self.root_path, first_display_label, f"{ytid}_{start_seconds}-{end_seconds}.{ext}")
+        if key in self.completed:
+            print(f"[SKIP] Already downloaded: {file_path}")
+            return
 
-        # skip if already exists and valid
+        # skip if already exists and valid (e.g. downloaded before the manifest existed)
         if os.path.exists(file_path):
             duration = self.get_audio_duration(file_path)
-            if duration and duration > 0.0:
+            if self._is_complete(duration, start_seconds, end_seconds):
                 print(f"[SKIP] Already downloaded: {file_path}")
+                if self._replicate(file_path, key, display_labels):
+                    self._record_completed(key, ytid, start_seconds, end_seconds, duration)
                 return
             else:
                 print(f"[RETRY] Corrupted file, re-downloading: {file_path}")
@@ -149,35 +537,82 @@ class Downloader:
 
         attempt = 0
         while attempt < self.max_retries:
-            command = self._build_ytdlp_command(ytid, file_path, start_seconds, end_seconds)
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
+            _breaker.wait()
+            error = self._run_ytdlp(ytid, file_path, start_seconds, end_seconds).lower()
 
-            # check if permanent failure
-            if "this video is unavailable" in result.stderr.lower() or "private" in result.stderr.lower() or "video has been removed" in result.stderr.lower():
+            # check if permanent failure, retrying won't help (rate limits are retried below)
+            rate_limited = any(msg in error for msg in _RATE_LIMIT_ERRORS)
+            if not rate_limited and any(msg in error for msg in _PERMANENT_ERRORS):
                 print(f"[FAILED: Permanent] Video unavailable or private: {ytid}")
                 return
 
             duration = self.get_audio_duration(file_path) if os.path.exists(file_path) else None
-            if duration and duration > 0.0:
+            if self._is_complete(duration, start_seconds, end_seconds):
+                _breaker.record_success()
                 break  # Success
 
+            if duration:
+                print(f"[RETRY] Got {duration:.2f}s, longer than the {end_seconds - start_seconds:.2f}s segment: {file_path}")
+                os.remove(file_path)
+
+            _breaker.record_failure()
+            # exponential backoff with jitter so parallel workers don't retry in lockstep
+            delay = min(self.max_delay, self.retry_delay * (2 ** attempt)) * (0.5 + random.random())
             attempt += 1
-            print(f"[RETRY] Attempt {attempt}/{self.max_retries} failed for {file_path}. Retrying in {self.retry_delay}s...")
+            if attempt == self.max_retries:
+                break  # no point waiting before giving up
+
+            print(f"[RETRY] Attempt {attempt}/{self.max_retries} failed for {file_path}. Retrying in {delay:.1f}s...")
 
-            # Refresh cookies if using browser cookies
-            if self.cookies_from_browser:
-                print("[INFO] Refreshing cookies from browser...")
-                os.system('yt-dlp --cookies-from-browser firefox --skip-download https://www.youtube.com')
+            # Pick up browser cookies refreshed in the background since this worker started
+            if self._cookie_timer is not None:
+                print("[INFO] Reloading browser cookies...")
+                self._reset_ydl()  # cookies are reloaded when the next YoutubeDL is created
 
-            time.sleep(self.retry_delay)
+            time.sleep(delay)
 
         if attempt == self.max_retries:
             print(f"[FAILED] Could not download file after {self.max_retries} attempts: {file_path}")
             return
 
-        if self.copy_and_replicate:
-            for label in positive_labels.split(',')[1:]:
-                display_label = self.machine_to_display_mapping[label]
-                target_path = os.path.join(self.root_path, display_label, f"{ytid}_{start_seconds}-{end_seconds}.{ext}")
-                os.system(f'cp "{file_path}" "{target_path}"')
+        if self._replicate(file_path, key, display_labels):
+            self._record_completed(key, ytid, start_seconds, end_seconds, duration)
         return
+
+    def _replicate(self, file_path: str, key: str, display_labels: list):
+        """
+        Creates the copies of file_path for the other labels that don't exist yet.
+        Returns False if one failed, so the segment stays out of the manifest and a rerun retries it.
+        """
+        if not self.copy_and_replicate:
+            return True
+
+        for display_label in display_labels[1:]:
+            target_path = os.path.join(self.root_path, display_label, key)
+            if os.path.exists(target_path):
+                continue
+            try:
+                try:
+                    _fastcopy(file_path, target_path)
+                except FileNotFoundError:
+                    # download() creates label directories up front, a direct download_file call doesn't
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    _fastcopy(file_path, target_path)
+            except OSError as e:
+                print(f"[FAILED] Could not replicate {file_path} to {target_path}: {e}")
+                return False
+        return True
+
+    def _is_complete(self, duration: float, start_seconds: float, end_seconds: float):
+        # shorter is fine, yt-dlp stops the range at the end of the video; longer means it wasn't trimmed
+        return bool(duration) and duration <= (end_seconds - start_seconds) + self.duration_tolerance
+
+    def _record_completed(self, key: str, ytid: str, start_seconds: float, end_seconds: float, duration: float):
+        _append_manifest(self.manifest_path, {
+            'key': key,
+            'ytid': ytid,
+            'start': start_seconds,
+            'end': end_seconds,
+            'duration': duration,
+        })
+        self.completed.add(key)
@@ -7,6 +7,7 @@ required_packages = [
     "joblib",
     "yt-dlp",
     "soundfile",
+    "mutagen",
     "numpy"
 ]
 
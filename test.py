@@ -1,13 +1,19 @@
+import csv
 import pandas as pd
 
 df = pd.read_csv(
     f"http://storage.googleapis.com/us_audioset/youtube_corpus/v1/csv/balanced_segments.csv", 
     sep=',', 
+    skipinitialspace=True,
+    quotechar='"',
+    quoting=csv.QUOTE_MINIMAL,
     skiprows=3,
     header=None,
     names=['YTID', 'start_seconds', 'end_seconds', 'positive_labels'],
-    engine='python'
+    engine='c'
 )
 
+assert not df['positive_labels'].str.contains('"').any(), "quotes were not stripped by the parser"
+
 print("Total rows:", len(df))
 print(df.head())
\ No newline at end of file